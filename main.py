@@ -1,9 +1,13 @@
 import cmd
+import itertools
+import operator
 import os
-import shutil
+import stat
+import sys
+from functools import lru_cache
 from pathlib import Path
 from rich.console import Console
-from rich.table import Table
+from rich.text import Text
 from rich.theme import Theme
 
 ROOT_DIR_NAME = 'TiwutApps'
@@ -24,6 +28,117 @@ custom_theme = Theme({
 
 console = Console(theme=custom_theme, style="on black", color_system="truecolor")
 
+# Resolved once so ls rows skip Rich's markup parser entirely.
+_ROW_STYLES = {name: console.get_style(name) for name in ("dir", "executable", "file")}
+
+# C-level unpacker for the ls inner loop; cheaper than two attribute
+# lookups per stat result.
+_get_size_mode = operator.attrgetter('st_size', 'st_mode')
+
+def _fmt_size(n):
+    """Formats a byte count using integer arithmetic only (no FP divide)."""
+    if n < 1024:
+        return f"{n} B"
+    if n < 1 << 20:
+        return f"{n >> 10}.{(n & 1023) * 100 >> 10:02d} KB"
+    return f"{n >> 20}.{(n & ((1 << 20) - 1)) * 100 >> 20:02d} MB"
+
+@lru_cache(maxsize=64)
+def _scan_dir(path_str, mtime_ns):
+    """Returns (type, name, size, style) row tuples for a directory.
+
+    Cached on (path, mtime) so repeated listings of an unchanged directory
+    skip the scandir walk entirely; any mutation bumps the directory mtime
+    and naturally invalidates the entry.
+    """
+    rows = []
+    with os.scandir(path_str) as it:
+        for entry in it:
+            size, mode = _get_size_mode(entry.stat(follow_symlinks=False))
+            if stat.S_ISDIR(mode):
+                rows.append(("DIR", entry.name, "--", "dir"))
+            elif mode & 0o111:
+                rows.append(("EXE", entry.name, _fmt_size(size), "executable"))
+            else:
+                rows.append(("FILE", entry.name, _fmt_size(size), "file"))
+    return tuple(rows)
+
+_HAS_SENDFILE = hasattr(os, 'sendfile')
+
+def _fast_copyfile(src_path, dst_path, st):
+    """Copies one file with zero-copy os.sendfile, preserving the mode.
+
+    Falls back to a buffered user-space copy when sendfile is unavailable
+    or refused by the filesystem.
+    """
+    dst_st = _stat_or_none(dst_path)
+    if dst_st is not None and (dst_st.st_dev, dst_st.st_ino) == (st.st_dev, st.st_ino):
+        # Opening dst for writing would truncate src before it is read.
+        import shutil
+        raise shutil.SameFileError(f"{src_path!r} and {dst_path!r} are the same file")
+    with open(src_path, 'rb') as fsrc, open(dst_path, 'wb') as fdst:
+        copied = False
+        if _HAS_SENDFILE:
+            try:
+                offset = 0
+                size = st.st_size
+                while offset < size:
+                    sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+                    if not sent:
+                        break
+                    offset += sent
+                copied = True
+            except OSError:
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        if not copied:
+            import shutil
+            shutil.copyfileobj(fsrc, fdst)
+    os.chmod(dst_path, st.st_mode)
+
+def _fast_copytree(src, dst):
+    """Recursively copies src into dst via scandir, reusing DirEntry stats."""
+    # Snapshot the listing before creating dst: when dst lies inside src,
+    # a live scandir iterator would pick it up and recurse into itself.
+    with os.scandir(src) as it:
+        entries = list(it)
+    os.makedirs(dst, exist_ok=True)
+    for entry in entries:
+        dst_path = os.path.join(dst, entry.name)
+        if entry.is_dir():
+            _fast_copytree(entry.path, dst_path)
+        else:
+            _fast_copyfile(entry.path, dst_path, entry.stat())
+
+def _fast_rmtree(path):
+    """Recursively deletes path using fwalk and dir_fd-relative syscalls.
+
+    The bottom-up fwalk reuses one open fd per directory, so every unlink
+    and rmdir skips full path resolution and cannot be raced through a
+    swapped-out parent directory.
+    """
+    if not hasattr(os, 'fwalk'):
+        import shutil
+        shutil.rmtree(path)
+        return
+    for root, dirs, files, rootfd in os.fwalk(path, topdown=False):
+        for name in files:
+            os.unlink(name, dir_fd=rootfd)
+        for name in dirs:
+            try:
+                os.rmdir(name, dir_fd=rootfd)
+            except NotADirectoryError:
+                os.unlink(name, dir_fd=rootfd)
+    os.rmdir(path)
+
+def _stat_or_none(path, follow_symlinks=True):
+    """Returns the stat result for path, or None if it cannot be stat'ed."""
+    try:
+        return os.stat(path, follow_symlinks=follow_symlinks)
+    except OSError:
+        return None
+
 class TiwutTerminal(cmd.Cmd):
     """
     Tiwut Terminal Emulator with file system operations.
@@ -36,9 +151,12 @@ class TiwutTerminal(cmd.Cmd):
         "[info]Type 'help' or '?' for a list of commands.[/info]\n"
     )
     
-    prompt = "" 
-    
+    prompt = ""
+
+    PLAIN_LS_THRESHOLD = 500
+
     _styled_prompt = ""
+    _ansi_prompt = ""
 
 
     def __init__(self):
@@ -46,7 +164,13 @@ class TiwutTerminal(cmd.Cmd):
         self.base_dir = BASE_DIR
         self.current_dir = self.base_dir
         self.terminal_name = "Tiwut"
-        
+        self._base_dir_str = str(self.base_dir)
+        self._base_dir_realpath = os.path.realpath(self._base_dir_str)
+        self._current_dir_str = self._base_dir_realpath
+        self._prompt_cache_key = None
+        self._dir_dirty = True
+        self._handlers = {name[3:]: getattr(self, name) for name in dir(self) if name.startswith('do_')}
+
         self._ensure_root_dir()
 
     def _ensure_root_dir(self):
@@ -54,40 +178,68 @@ class TiwutTerminal(cmd.Cmd):
         try:
             self.base_dir.mkdir(parents=True, exist_ok=True)
             self.current_dir = self.base_dir
+            self._current_dir_str = self._base_dir_realpath
         except Exception as e:
             console.print(f"[error]FATAL ERROR: Could not create or access root directory {self.base_dir}.[/error]", style="bold red on black")
             console.print(f"[error]Reason: {e}[/error]")
             exit(1)
 
     def _update_prompt(self):
-        """Updates the prompt with the current path."""
+        """Updates the prompt with the current path (cached per directory)."""
+        if not self._dir_dirty:
+            return
+        self._dir_dirty = False
+
+        if self.current_dir == self._prompt_cache_key:
+            return
+
         try:
-            relative_path = self.current_dir.relative_to(self.base_dir)
-            
-            path_display = "~" if str(relative_path) == "." else str(relative_path)
-            
+            relative_path = os.path.relpath(self._current_dir_str, self._base_dir_realpath)
+
+            path_display = "~" if relative_path == "." else relative_path
+
             self._styled_prompt = f"[bold yellow]{self.terminal_name}[/bold yellow]:[path]{path_display}[/path]$ "
         except ValueError:
             self._styled_prompt = f"[bold yellow]{self.terminal_name}[/bold yellow]:[error]ERROR_PATH[/error]$ "
+
+        with console.capture() as capture:
+            console.print(self._styled_prompt, end="", highlight=True)
+        self._ansi_prompt = capture.get()
+
+        self._prompt_cache_key = self.current_dir
     
     def preloop(self):
         """Executed once before the main loop starts."""
         self._update_prompt()
         console.print(self.INTRO_TEMPLATE.format(base_dir=self.base_dir), highlight=True)
-        console.print(self._styled_prompt, end="", highlight=True) 
+        sys.stdout.write(self._ansi_prompt)
+        sys.stdout.flush()
     
     def onecmd(self, line):
-        """Handle a single command."""
+        """Handle a single command via direct dict dispatch."""
         self.precmd(line)
-        
-        if not line.strip():
-            console.print(self._styled_prompt, end="", highlight=True)
+
+        stripped = line.strip()
+        if not stripped:
+            sys.stdout.write(self._ansi_prompt)
+            sys.stdout.flush()
             return self.emptyline()
 
-        stop = cmd.Cmd.onecmd(self, line)
-        
+        if stripped.startswith('?'):
+            stripped = 'help ' + stripped[1:].lstrip()
+
+        self.lastcmd = '' if stripped == 'EOF' else stripped
+
+        command, _, arg = stripped.partition(' ')
+        handler = self._handlers.get(command)
+        if handler is not None:
+            stop = handler(arg.strip())
+        else:
+            stop = self.default(stripped)
+
         if not stop:
-            console.print(self._styled_prompt, end="", highlight=True)
+            sys.stdout.write(self._ansi_prompt)
+            sys.stdout.flush()
 
         return stop
 
@@ -107,39 +259,51 @@ class TiwutTerminal(cmd.Cmd):
     
     def do_ls(self, arg):
         """
-        List directory contents.
-        Usage: ls [path]
+        List directory contents in directory order; pass -s to sort by name.
+        Usage: ls [-s] [path]
         """
-        target_path = self.current_dir / arg if arg else self.current_dir
-        
-        if not target_path.exists():
-            console.print(f"[error]Error: Directory or file not found: {target_path.name}[/error]")
-            return
-        
-        if not target_path.is_dir():
-            console.print(f"[error]Error: Not a directory: {target_path.name}[/error]")
+        arg = arg.strip()
+        sort_entries = arg in ('-s', '--sort')
+        if sort_entries:
+            arg = ''
+        elif arg.startswith('-s ') or arg.startswith('-s\t'):
+            sort_entries = True
+            arg = arg[3:].lstrip()
+        elif arg.startswith('--sort ') or arg.startswith('--sort\t'):
+            sort_entries = True
+            arg = arg[7:].lstrip()
+
+        target_path = os.path.join(self._current_dir_str, arg) if arg else self._current_dir_str
+        target_name = os.path.basename(target_path)
+
+        st = _stat_or_none(target_path)
+        if st is None:
+            console.print(f"[error]Error: Directory or file not found: {target_name}[/error]")
             return
 
-        table = Table(title=f"Contents of [path]{target_path.name}[/path]", style="bold white", border_style="dim white")
-        table.add_column("Type", style="info", width=5)
-        table.add_column("Name", style="file")
-        table.add_column("Size", style="info", justify="right")
+        if not stat.S_ISDIR(st.st_mode):
+            console.print(f"[error]Error: Not a directory: {target_name}[/error]")
+            return
 
         try:
-            for entry in sorted(target_path.iterdir()):
-                stat = entry.stat()
-                name = entry.name
-                
-                if entry.is_dir():
-                    size = "--" 
-                    table.add_row("DIR", name, size, style="dir")
-                else:
-                    size = f"{stat.st_size / 1024:.2f} KB"
-                    if os.access(entry, os.X_OK):
-                        table.add_row("EXE", name, size, style="executable")
-                    else:
-                        table.add_row("FILE", name, size, style="file")
-                    
+            rows = _scan_dir(target_path, st.st_mtime_ns)
+            if sort_entries:
+                rows = sorted(rows, key=lambda row: row[1])
+
+            if not console.is_terminal or len(rows) > self.PLAIN_LS_THRESHOLD:
+                sys.stdout.write('\n'.join(row[1] for row in rows) + '\n')
+                return
+
+            from rich.table import Table
+            table = Table(title=f"Contents of [path]{target_name}[/path]", style="bold white", border_style="dim white")
+            table.add_column("Type", style="info", width=5)
+            table.add_column("Name", style="file")
+            table.add_column("Size", style="info", justify="right")
+
+            for kind, name, size, style in rows:
+                row_style = _ROW_STYLES[style]
+                table.add_row(Text(kind, style=row_style), Text(name, style=row_style), Text(size, style=row_style))
+
             console.print(table)
         except PermissionError:
             console.print("[error]Permission denied.[/error]")
@@ -154,25 +318,33 @@ class TiwutTerminal(cmd.Cmd):
         """
         if not arg:
             self.current_dir = self.base_dir
+            self._current_dir_str = self._base_dir_realpath
+            self._dir_dirty = True
             console.print("[success]Changed directory to root (~)[/success]")
             return
 
-        target_path = self.current_dir / arg
-        
+        target_path = os.path.join(self._current_dir_str, arg)
+
         if arg == '..':
-            if self.current_dir == self.base_dir:
+            if self._current_dir_str == self._base_dir_realpath:
                 console.print("[warning]Cannot move above the root directory.[/warning]")
                 return
-            target_path = self.current_dir.parent
+            target_path = os.path.dirname(self._current_dir_str)
 
         try:
-            if not target_path.exists() or not target_path.is_dir():
+            st = _stat_or_none(target_path)
+            if st is None or not stat.S_ISDIR(st.st_mode):
                 console.print(f"[error]Error: Directory not found: {arg}[/error]")
                 return
-            
-            target_path.relative_to(self.base_dir) 
-            
-            self.current_dir = target_path
+
+            resolved = os.path.realpath(target_path)
+            if os.path.commonpath((resolved, self._base_dir_realpath)) != self._base_dir_realpath:
+                console.print("[error]Error: Access denied. Cannot move outside the root path.[/error]")
+                return
+
+            self.current_dir = Path(resolved)
+            self._current_dir_str = resolved
+            self._dir_dirty = True
             console.print(f"[success]Changed directory to {arg}[/success]")
             
         except ValueError:
@@ -226,27 +398,27 @@ class TiwutTerminal(cmd.Cmd):
         Usage: rm <file_name>
         Usage: rm -r <directory_name> (FORCED, use with caution)
         """
-        parts = arg.split()
-        if not parts:
+        arg = arg.strip()
+        if not arg:
             console.print("[error]Usage: rm <file_name> or rm -r <directory_name>[/error]")
             return
 
-        target_name = parts[-1]
-        target_path = self.current_dir / target_name
-        
-        if not target_path.exists():
+        is_recursive = arg.startswith('-r ') or arg.startswith('-r\t')
+        target_name = arg[3:].lstrip() if is_recursive else arg
+        target_path = os.path.join(self._current_dir_str, target_name)
+
+        st = _stat_or_none(target_path, follow_symlinks=False)
+        if st is None:
             console.print(f"[error]Error: File or directory not found: {target_name}[/error]")
             return
-            
-        is_recursive = '-r' in parts
 
         try:
-            if target_path.is_file():
+            if stat.S_ISREG(st.st_mode):
                 os.remove(target_path)
                 console.print(f"[success]File removed: {target_name}[/success]")
-            elif target_path.is_dir():
+            elif stat.S_ISDIR(st.st_mode):
                 if is_recursive:
-                    shutil.rmtree(target_path)
+                    _fast_rmtree(target_path)
                     console.print(f"[success]Directory (and contents) removed: {target_name}[/success]")
                 else:
                     console.print(f"[error]Error: Cannot remove directory {target_name}. Use 'rmdir' for empty directories or 'rm -r' for non-empty directories.[/error]")
@@ -274,20 +446,33 @@ class TiwutTerminal(cmd.Cmd):
         source_path = self.current_dir / source
         destination_path = self.current_dir / destination
 
-        if not source_path.exists():
+        source_st = _stat_or_none(source_path)
+        if source_st is None:
             console.print(f"[error]Error: Source not found: {source}[/error]")
             return
 
+        # Overwriting an existing destination rewrites files in place
+        # without bumping the directory mtime, so the ls cache would keep
+        # serving the old rows; drop it after those copies.
+        overwriting = _stat_or_none(destination_path) is not None
+
         try:
-            if source_path.is_file():
+            if stat.S_ISREG(source_st.st_mode):
+                import shutil
                 shutil.copy2(source_path, destination_path)
+                if overwriting:
+                    _scan_dir.cache_clear()
                 console.print(f"[success]File copied from {source} to {destination}[/success]")
-            elif source_path.is_dir():
-                if destination_path.exists() and destination_path.is_dir():
-                    shutil.copytree(source_path, destination_path / source, dirs_exist_ok=True)
+            elif stat.S_ISDIR(source_st.st_mode):
+                destination_st = _stat_or_none(destination_path)
+                if destination_st is not None and stat.S_ISDIR(destination_st.st_mode):
+                    _fast_copytree(str(source_path), str(destination_path / source))
+                    _scan_dir.cache_clear()
                     console.print(f"[success]Directory copied (recursively) from {source} to {destination}/{source}[/success]")
                 else:
-                    shutil.copytree(source_path, destination_path)
+                    _fast_copytree(str(source_path), str(destination_path))
+                    if overwriting:
+                        _scan_dir.cache_clear()
                     console.print(f"[success]Directory copied (recursively) from {source} to {destination}[/success]")
             else:
                 console.print("[error]Error: Source is neither a file nor a directory.[/error]")
@@ -305,26 +490,36 @@ class TiwutTerminal(cmd.Cmd):
         if not arg:
             console.print("[error]Usage: cat <file_name>[/error]")
             return
-            
-        target_path = self.current_dir / arg
+
+        target_path = os.path.join(self._current_dir_str, arg)
         
-        if not target_path.exists() or not target_path.is_file():
+        st = _stat_or_none(target_path)
+        if st is None or not stat.S_ISREG(st.st_mode):
             console.print(f"[error]Error: File not found: {arg}[/error]")
             return
 
         MAX_SIZE = 10 * 1024 * 1024
+        CHUNK_SIZE = 1 << 16
         try:
-            if target_path.stat().st_size > MAX_SIZE:
-                 console.print(f"[warning]Warning: File is too large ({target_path.stat().st_size / (1024*1024):.2f} MB). Displaying only the first 50 lines.[/warning]")
+            with open(target_path, 'rb') as f:
+                head = f.read(4096)
+
+            # Classic file(1) heuristic: NUL bytes or a high share of
+            # control characters mean binary — bail before decoding.
+            if b'\x00' in head or sum(1 for b in head if b < 9 or 13 < b < 32) > len(head) // 10:
+                console.print("[error]Error: Cannot display file content. It might be a binary file.[/error]")
+                return
+
+            if st.st_size > MAX_SIZE:
+                 console.print(f"[warning]Warning: File is too large ({st.st_size / (1024*1024):.2f} MB). Displaying only the first 50 lines.[/warning]")
                  with open(target_path, 'r', encoding='utf-8') as f:
-                     lines = [f.readline() for _ in range(50)]
-                     console.print("".join(lines), style="dim white")
+                     console.print("".join(itertools.islice(f, 50)), style="dim white")
             else:
-                with open(target_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
                 console.print(f"\n[bold magenta]--- Content of {arg} ---[/bold magenta]", style="dim white")
-                console.print(content, style="dim white")
-                console.print(f"[bold magenta]------------------------------------[/bold magenta]\n", style="dim white")
+                with open(target_path, 'r', encoding='utf-8', buffering=CHUNK_SIZE) as f:
+                    while chunk := f.read(CHUNK_SIZE):
+                        console.print(chunk, style="dim white", end="")
+                console.print(f"\n[bold magenta]------------------------------------[/bold magenta]\n", style="dim white")
         
         except UnicodeDecodeError:
             console.print("[error]Error: Cannot display file content. It might be a binary file.[/error]")
@@ -343,19 +538,23 @@ class TiwutTerminal(cmd.Cmd):
     do_quit = do_exit
     do_EOF = do_exit
 
+    HELP_TEXT = "\n".join((
+        "\n[bold cyan]Available Commands:[/bold cyan]",
+        "  [command]ls[/command]      : List directory contents.",
+        "  [command]cd[/command]      : Change directory.",
+        "  [command]pwd[/command]     : Print working directory.",
+        "  [command]mkdir[/command]   : Create a new directory.",
+        "  [command]rmdir[/command]   : Remove an EMPTY directory.",
+        "  [command]rm[/command]      : Remove a file or directory (use -r for recursive).",
+        "  [command]cp[/command]      : Copy a file or directory.",
+        "  [command]cat[/command]     : Display the content of a text file.",
+        "  [command]help[/command]    : Show help for a command (e.g., help ls).",
+        "  [command]exit[/command]    : Exit the terminal.\n",
+    ))
+
     def help_commands(self):
         """Shows a summary of all main commands."""
-        console.print("\n[bold cyan]Available Commands:[/bold cyan]")
-        console.print("  [command]ls[/command]      : List directory contents.")
-        console.print("  [command]cd[/command]      : Change directory.")
-        console.print("  [command]pwd[/command]     : Print working directory.")
-        console.print("  [command]mkdir[/command]   : Create a new directory.")
-        console.print("  [command]rmdir[/command]   : Remove an EMPTY directory.")
-        console.print("  [command]rm[/command]      : Remove a file or directory (use -r for recursive).")
-        console.print("  [command]cp[/command]      : Copy a file or directory.")
-        console.print("  [command]cat[/command]     : Display the content of a text file.")
-        console.print("  [command]help[/command]    : Show help for a command (e.g., help ls).")
-        console.print("  [command]exit[/command]    : Exit the terminal.\n")
+        console.print(self.HELP_TEXT)
 
 if __name__ == '__main__':
     try: